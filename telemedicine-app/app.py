@@ -1,17 +1,35 @@
-from flask import Flask, render_template, request, redirect, session, flash, url_for
+from flask import Flask, render_template, request, redirect, session, flash, url_for, g, has_request_context
 from flask_sqlalchemy import SQLAlchemy
+from flask_migrate import Migrate, stamp
+from sqlalchemy import and_, event, func, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import selectinload, raiseload
 from flask_wtf.csrf import CSRFProtect
-from werkzeug.security import generate_password_hash, check_password_hash
+from flask_caching import Cache
+from flask_limiter import Limiter
+from flask_limiter.util import get_remote_address
+from flask_session import Session
+import redis
+from jinja2 import FileSystemBytecodeCache
+from argon2 import PasswordHasher
 from datetime import datetime, timezone, timedelta
 import os
 import re
-import random
+import sqlite3
+import json
+import hashlib
+import hmac
+import secrets
+import time
 import logging
 import uuid
-import requests
-import threading
-import time
+from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.jobstores.base import JobLookupError
+from apscheduler.jobstores.memory import MemoryJobStore
+from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
 from dotenv import load_dotenv
+from tasks import diagnose, send_otp, send_reminder_notification
 
 # Configure logging
 logging.basicConfig(
@@ -21,15 +39,70 @@ logging.basicConfig(
 )
 logger = logging.getLogger('telemedicine-app')
 
+# Registration validators, compiled once at import
+_EMAIL_RE = re.compile(r"^[a-z0-9._%+-]+@[a-z0-9.-]+\.[a-z]{2,}$")
+_PHONE_RE = re.compile(r"^\+?[1-9]\d{7,14}$")
+
 load_dotenv()
 
+DEBUG = os.getenv("DEBUG", "False").lower() in ("1", "true")
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+SYMPTOM_CACHE_TTL = 3600
+OTP_SECRET = os.getenv("OTP_SECRET") or os.getenv("SECRET_KEY")
+if not OTP_SECRET:
+    # An empty HMAC key would let anyone with a DB dump brute-force stored OTPs
+    raise RuntimeError("OTP_SECRET or SECRET_KEY must be set")
+OTP_SECRET = OTP_SECRET.encode()
+OTP_TTL = timedelta(minutes=5)
+SLOW_QUERY_THRESHOLD = float(os.getenv("SLOW_QUERY_THRESHOLD", 0.1))  # seconds
+
+DATABASE_URI = os.getenv("DATABASE_URI", "sqlite:///database.db?check_same_thread=False")
+ENGINE_OPTIONS = {"pool_pre_ping": True}
+if not DATABASE_URI.startswith("sqlite"):
+    ENGINE_OPTIONS.update(pool_size=10, max_overflow=20)
+
 app = Flask(__name__)
 app.secret_key = os.getenv("SECRET_KEY")
 app.config.update(
-    SQLALCHEMY_DATABASE_URI=os.getenv("DATABASE_URI", "sqlite:///database.db?check_same_thread=False"),
+    SQLALCHEMY_DATABASE_URI=DATABASE_URI,
     SQLALCHEMY_TRACK_MODIFICATIONS=False,
-    SQLALCHEMY_ENGINE_OPTIONS={"pool_pre_ping": True}
+    SQLALCHEMY_ENGINE_OPTIONS=ENGINE_OPTIONS,
+    TEMPLATES_AUTO_RELOAD=DEBUG,
+    SESSION_TYPE="redis",
+    SESSION_REDIS=redis.from_url(REDIS_URL)
 )
+app.jinja_env.auto_reload = DEBUG
+
+# Share compiled template bytecode across restarts and workers. Jinja's default
+# directory is per-uid, mode 0700 and owner-checked; the cached bytecode gets
+# unmarshalled and executed, so only use another location if explicitly configured.
+jinja_cache_dir = os.getenv("JINJA_CACHE_DIR")
+if jinja_cache_dir:
+    os.makedirs(jinja_cache_dir, mode=0o700, exist_ok=True)
+app.jinja_env.bytecode_cache = FileSystemBytecodeCache(directory=jinja_cache_dir)
+
+# WAL lets request threads keep reading while the scheduler writes
+@event.listens_for(Engine, "connect")
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.close()
+
+# Log slow statements and count queries per request (exposed as X-Query-Count in debug)
+@event.listens_for(Engine, "before_cursor_execute")
+def start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    # Per-execution context, so a statement that raises leaves nothing behind on the pooled connection
+    context._query_start_time = time.perf_counter()
+
+@event.listens_for(Engine, "after_cursor_execute")
+def log_slow_query(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context._query_start_time
+    if elapsed > SLOW_QUERY_THRESHOLD:
+        logger.warning(f"Slow query ({elapsed:.3f}s): {statement}")
+    if has_request_context():
+        g.query_count = g.get("query_count", 0) + 1
 
 # Custom Jinja2 filter for datetime formatting
 def datetimeformat(value, format='%Y-%m-%d %H:%M:%S'):
@@ -41,8 +114,39 @@ def datetimeformat(value, format='%Y-%m-%d %H:%M:%S'):
 
 app.jinja_env.filters['datetimeformat'] = datetimeformat
 
+TEMPLATES = (
+    'base.html', 'home.html', 'login.html', 'verify.html', 'register.html',
+    'dashboard_doctor.html', 'dashboard_patient.html', 'book.html', 'video_call.html',
+    'symptom_checker.html', 'symptom_pending.html', 'symptom_results.html', 'view_reminders.html'
+)
+
+def warm_template_cache():
+    """Compile every page template up front so the first request doesn't pay for it"""
+    for name in TEMPLATES:
+        app.jinja_env.get_template(name)
+
 csrf = CSRFProtect(app)
+Session(app)
 db = SQLAlchemy(app)
+migrate = Migrate(app, db)
+cache = Cache(app, config={'CACHE_TYPE': 'RedisCache', 'CACHE_REDIS_URL': REDIS_URL})
+limiter = Limiter(get_remote_address, app=app, storage_uri=REDIS_URL)
+# argon2-cffi releases the GIL while hashing, so other request threads keep running
+password_hasher = PasswordHasher(time_cost=2, memory_cost=65536, parallelism=2)
+
+# One job per reminder, stored in the app database so pending jobs survive restarts.
+# Web processes run the scheduler paused: they only write jobs to the store, and
+# the single `flask run-scheduler` process executes them.
+SCHEDULER_POLL_INTERVAL = 60  # seconds, how soon jobs added by other processes are noticed
+with app.app_context():
+    scheduler = BackgroundScheduler(
+        jobstores={'default': SQLAlchemyJobStore(engine=db.engine), 'local': MemoryJobStore()},
+        # Reminder times are stored as UTC, like availability slots
+        timezone=timezone.utc,
+        # Jobs missed while the scheduler was down run once on resume, however late
+        job_defaults={'coalesce': True, 'misfire_grace_time': None}
+    )
+scheduler.start(paused=True)
 
 # ----------------- Models -----------------
 class User(db.Model):
@@ -54,16 +158,30 @@ class User(db.Model):
     password = db.Column(db.String(200), nullable=False)
     specialty = db.Column(db.String(50))
     otp = db.Column(db.String(200))
+    otp_expires_at = db.Column(db.DateTime(timezone=True))
     status = db.Column(db.String(10), default="Offline")
 
+    @staticmethod
+    def _otp_digest(otp):
+        # Short-lived 6-digit code: a keyed HMAC is enough, no need for a slow KDF
+        return hmac.new(OTP_SECRET, otp.encode(), hashlib.sha256).hexdigest()
+
     def set_otp(self):
-        otp = str(random.randint(100000, 999999))
-        self.otp = generate_password_hash(otp)
+        otp = f"{secrets.randbelow(1_000_000):06d}"
+        self.otp = self._otp_digest(otp)
+        self.otp_expires_at = datetime.now(timezone.utc) + OTP_TTL
         db.session.commit()
         return otp
 
     def verify_otp(self, entered_otp):
-        return check_password_hash(self.otp, entered_otp.strip()) if self.otp else False
+        if not self.otp or not self.otp_expires_at:
+            return False
+        expires_at = self.otp_expires_at
+        if expires_at.tzinfo is None:  # SQLite drops the offset
+            expires_at = expires_at.replace(tzinfo=timezone.utc)
+        if expires_at < datetime.now(timezone.utc):
+            return False
+        return hmac.compare_digest(self.otp, self._otp_digest(entered_otp.strip()))
 
 class Reminder(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -73,7 +191,12 @@ class Reminder(db.Model):
     notes = db.Column(db.Text)
     frequency = db.Column(db.String(20), default='once')
     alerted = db.Column(db.Boolean, default=False)
-    user = db.relationship('User', foreign_keys=[user_id])
+    user = db.relationship('User', foreign_keys=[user_id], lazy='raise')
+
+    __table_args__ = (
+        db.Index('ix_rem_alerted_time', 'alerted', 'reminder_time'),
+        db.Index('ix_rem_user_time', 'user_id', 'reminder_time'),
+    )
 
 class DoctorAvailability(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -81,7 +204,11 @@ class DoctorAvailability(db.Model):
     start_time = db.Column(db.DateTime(timezone=True), nullable=False)
     end_time = db.Column(db.DateTime(timezone=True), nullable=False)
     status = db.Column(db.String(20), default='available')
-    doctor = db.relationship('User', foreign_keys=[doctor_id])
+    doctor = db.relationship('User', foreign_keys=[doctor_id], lazy='raise')
+
+    __table_args__ = (
+        db.Index('ix_avail_doctor_status_start', 'doctor_id', 'status', 'start_time'),
+    )
 
 class Appointment(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -91,20 +218,102 @@ class Appointment(db.Model):
     appointment_time = db.Column(db.DateTime(timezone=True), nullable=False)
     status = db.Column(db.String(20), default="Pending")
     room_id = db.Column(db.String(36), unique=True)
-    patient = db.relationship("User", foreign_keys=[patient_id])
-    doctor = db.relationship("User", foreign_keys=[doctor_id])
-    availability = db.relationship('DoctorAvailability')
+    # Relationships must be loaded explicitly (selectinload) to avoid N+1 queries
+    patient = db.relationship("User", foreign_keys=[patient_id], lazy='raise')
+    doctor = db.relationship("User", foreign_keys=[doctor_id], lazy='raise')
+    availability = db.relationship('DoctorAvailability', lazy='raise')
+
+    __table_args__ = (
+        db.Index('ix_appt_doctor_time', 'doctor_id', 'appointment_time'),
+        db.Index('ix_appt_patient_time', 'patient_id', 'appointment_time'),
+    )
 
 # ----------------- Helper Functions -----------------
 def generate_room_id():
     return uuid.uuid4().hex[:8]  # 8-character ID
 
+def get_online_doctors():
+    # Column rows rather than User entities; templates only need these fields.
+    # Open slot counts come from the same grouped query, not one query per doctor.
+    open_slot = and_(
+        DoctorAvailability.doctor_id == User.id,
+        DoctorAvailability.status == 'available',
+        DoctorAvailability.start_time > datetime.now(timezone.utc)
+    )
+    return db.session.execute(
+        select(User.id, User.name, User.specialty,
+               func.count(DoctorAvailability.id).label("slot_count"))
+        .outerjoin(DoctorAvailability, open_slot)
+        .where(User.role == "doctor", User.status == "Online")
+        .group_by(User.id, User.name, User.specialty)
+    ).all()
+
+def symptom_cache_key(symptoms, age, gender):
+    canonical = [sorted(s.strip().lower() for s in symptoms), age, gender.lower()]
+    return "sx:" + hashlib.sha1(json.dumps(canonical).encode()).hexdigest()
+
+def reminder_job_id(reminder_id):
+    return f"rem-{reminder_id}"
+
+def schedule_reminder(reminder):
+    # Referenced by name so the job resolves in the scheduler process even when
+    # the web process was started as __main__
+    func = 'app:fire_reminder'
+    job_id = reminder_job_id(reminder.id)
+    if reminder.frequency == 'daily':
+        scheduler.add_job(func, 'interval', days=1, start_date=reminder.reminder_time,
+                          args=[reminder.id], id=job_id, replace_existing=True)
+    elif reminder.frequency == 'weekly':
+        scheduler.add_job(func, 'interval', weeks=1, start_date=reminder.reminder_time,
+                          args=[reminder.id], id=job_id, replace_existing=True)
+    else:
+        scheduler.add_job(func, 'date', run_date=reminder.reminder_time,
+                          args=[reminder.id], id=job_id, replace_existing=True)
+
+def as_utc(value):
+    # SQLite hands DateTime(timezone=True) columns back naive; they are stored as UTC
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+def advance_reminder(reminder, now):
+    """Mark a one-off reminder alerted, or move a recurring one to its next occurrence
+    after `now` -- the same start + k * interval schedule its interval trigger follows"""
+    if reminder.frequency == 'daily':
+        step = timedelta(days=1)
+    elif reminder.frequency == 'weekly':
+        step = timedelta(weeks=1)
+    else:
+        reminder.alerted = True
+        return
+    next_time = as_utc(reminder.reminder_time)
+    while next_time <= now:
+        next_time += step
+    reminder.reminder_time = next_time
+
+def unschedule_reminder(reminder_id):
+    try:
+        scheduler.remove_job(reminder_job_id(reminder_id))
+    except JobLookupError:
+        pass
+
 # ----------------- Routes -----------------
+@app.before_request
+def load_current_user():
+    g.user = None
+    if request.endpoint != "static" and "user_id" in session:
+        g.user = db.session.get(User, session["user_id"])
+
+@app.after_request
+def add_query_count_header(response):
+    if app.debug:
+        response.headers["X-Query-Count"] = str(g.get("query_count", 0))
+    return response
+
 @app.route("/")
 def home():
     return render_template("home.html")
 
 @app.route("/<role>-login", methods=["GET", "POST"])
+@limiter.limit("10/minute", methods=["POST"])
 def role_login(role):
     try:
         if request.method == "POST":
@@ -120,7 +329,7 @@ def role_login(role):
                 return redirect(f"/{role}-login")
 
             otp = user.set_otp()
-            session['otp'] = otp
+            send_otp.delay(user.email, otp)
             return redirect(url_for("verify", email=email))
             
         return render_template("login.html", role=role.capitalize())
@@ -130,6 +339,7 @@ def role_login(role):
         return redirect("/")
 
 @app.route("/verify", methods=["GET", "POST"])
+@limiter.limit("5/minute", methods=["POST"])
 def verify():
     try:
         if request.method == "POST":
@@ -144,11 +354,10 @@ def verify():
             if user.verify_otp(entered_otp):
                 session.update({
                     "user_id": user.id,
-                    "email": user.email,
-                    "role": user.role.lower(),
-                    "name": user.name
+                    "role": user.role.lower()
                 })
                 user.otp = None
+                user.otp_expires_at = None
                 if user.role == "doctor":
                     user.status = "Online"
                 db.session.commit()
@@ -158,8 +367,7 @@ def verify():
             return redirect(url_for("verify", email=email))
         
         email = request.args.get("email")
-        otp = session.pop('otp', None)
-        return render_template("verify.html", email=email, otp=otp)
+        return render_template("verify.html", email=email)
     
     except Exception as e:
         logger.error(f"Verification error: {str(e)}", exc_info=True)
@@ -184,12 +392,14 @@ def register():
             
             if len(name) < 3:
                 errors.append("Name must be at least 3 characters")
-            if not re.match(r"^[a-z0-9._%+-]+@[a-z0-9.-]+\.[a-z]{2,}$", email):
+            if not _EMAIL_RE.match(email):
                 errors.append("Invalid email format")
-            clean_phone = re.sub(r"[^0-9+]", "", phone)
-            if not re.match(r"^\+?[1-9]\d{7,14}$", clean_phone):
+            clean_phone = "".join(c for c in phone if c == "+" or "0" <= c <= "9")
+            if not _PHONE_RE.match(clean_phone):
                 errors.append("Invalid phone number format")
-            if len(password) < 8 or not re.search(r"\d", password) or not re.search(r"[A-Za-z]", password):
+            has_digit = any(ch.isdecimal() for ch in password)
+            has_letter = any(ch.isascii() and ch.isalpha() for ch in password)
+            if len(password) < 8 or not has_digit or not has_letter:
                 errors.append("Password must be 8+ characters with letters and numbers")
             if password != confirm:
                 errors.append("Passwords do not match")
@@ -197,8 +407,6 @@ def register():
                 errors.append("Invalid role selection")
             if role == "doctor" and not specialty:
                 errors.append("Specialty is required for doctors")
-            if User.query.filter((User.email == email) | (User.phone == clean_phone)).first():
-                errors.append("Email or phone already registered")
 
             if errors:
                 for error in errors:
@@ -214,11 +422,20 @@ def register():
                 email=email,
                 phone=clean_phone,
                 role=role,
-                password=generate_password_hash(password),
+                password=password_hasher.hash(password),
                 specialty=specialty
             )
-            db.session.add(new_user)
-            db.session.commit()
+            try:
+                db.session.add(new_user)
+                db.session.commit()
+            except IntegrityError as e:
+                db.session.rollback()
+                flash("Phone already registered" if "phone" in str(e.orig) else "Email already registered", "danger")
+                return render_template("register.html",
+                                    name=name,
+                                    email=email,
+                                    phone=phone,
+                                    role=role.capitalize())
             
             flash("Registration successful! Please login", "success")
             return redirect(f"/{role}-login")
@@ -276,14 +493,16 @@ def doctor_dashboard():
             logger.error(f"Availability error: {str(e)}")
             flash("Error saving availability", "danger")
     
-    appointments = Appointment.query.filter_by(doctor_id=doctor_id)\
+    appointments = Appointment.query\
+                    .options(selectinload(Appointment.patient), raiseload('*'))\
+                    .filter_by(doctor_id=doctor_id)\
                     .order_by(Appointment.appointment_time.desc()).all()
     availability_slots = DoctorAvailability.query.filter_by(doctor_id=doctor_id)\
                              .order_by(DoctorAvailability.start_time).all()
     
     min_date = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M')
     return render_template("dashboard_doctor.html", 
-                         user=session,
+                         user=g.user,
                          appointments=appointments,
                          availability_slots=availability_slots,
                          min_date=min_date)
@@ -293,12 +512,14 @@ def patient_dashboard():
     if "user_id" not in session or session["role"] != "patient":
         return redirect("/patient-login")
     
-    online_doctors = User.query.filter_by(role="doctor", status="Online").all()
-    appointments = Appointment.query.filter_by(patient_id=session["user_id"])\
+    online_doctors = get_online_doctors()
+    appointments = Appointment.query\
+                    .options(selectinload(Appointment.doctor), raiseload('*'))\
+                    .filter_by(patient_id=session["user_id"])\
                     .order_by(Appointment.appointment_time.desc()).all()
     
     return render_template("dashboard_patient.html",
-                         user=session,
+                         user=g.user,
                          doctors=online_doctors,
                          appointments=appointments)
 
@@ -308,7 +529,7 @@ def toggle_status():
         return redirect("/doctor-login")
     
     try:
-        user = User.query.get(session["user_id"])
+        user = g.user
         user.status = "Online" if user.status == "Offline" else "Offline"
         db.session.commit()
         flash(f"Status changed to {user.status}", "success")
@@ -324,14 +545,12 @@ def book_appointment():
     if "user_id" not in session or session["role"] != "patient":
         return redirect("/patient-login")
 
-    online_doctors = User.query.filter_by(role="doctor", status="Online").all()
-    
     if request.method == "POST":
         try:
             availability_id = request.form.get("availability_id")
             doctor_id = request.form.get("doctor_id")
             
-            availability = DoctorAvailability.query.get(availability_id)
+            availability = db.session.get(DoctorAvailability, availability_id)
             if not availability or availability.status != 'available' or availability.doctor_id != int(doctor_id):
                 flash("Slot no longer available", "danger")
                 return redirect("/book")
@@ -356,14 +575,19 @@ def book_appointment():
             logger.error(f"Booking error: {str(e)}")
             flash("Failed to book appointment", "danger")
 
+    online_doctors = get_online_doctors()
     doctor_id = request.args.get("doctor_id")
     available_slots = []
     if doctor_id:
-        available_slots = DoctorAvailability.query.filter(
-            DoctorAvailability.doctor_id == doctor_id,
-            DoctorAvailability.status == 'available',
-            DoctorAvailability.start_time > datetime.now(timezone.utc)
-        ).order_by(DoctorAvailability.start_time).all()
+        available_slots = db.session.execute(
+            select(DoctorAvailability.id, DoctorAvailability.start_time, DoctorAvailability.end_time)
+            .where(
+                DoctorAvailability.doctor_id == doctor_id,
+                DoctorAvailability.status == 'available',
+                DoctorAvailability.start_time > datetime.now(timezone.utc)
+            )
+            .order_by(DoctorAvailability.start_time)
+        ).all()
     
     return render_template("book.html", 
                          doctors=online_doctors,
@@ -377,7 +601,7 @@ def delete_slot(slot_id):
         return redirect("/doctor-login")
     
     try:
-        slot = DoctorAvailability.query.get(slot_id)
+        slot = db.session.get(DoctorAvailability, slot_id)
         if slot and slot.doctor_id == session["user_id"]:
             db.session.delete(slot)
             db.session.commit()
@@ -396,7 +620,11 @@ def video_call(room_id):
     if "user_id" not in session:
         return redirect("/")
     
-    appointment = Appointment.query.filter_by(room_id=room_id).first()
+    appointment = Appointment.query\
+                    .options(selectinload(Appointment.patient),
+                             selectinload(Appointment.doctor),
+                             raiseload('*'))\
+                    .filter_by(room_id=room_id).first()
     if not appointment:
         flash("Invalid room ID", "danger")
         return redirect(f"/{session['role']}-dashboard")
@@ -413,7 +641,8 @@ def cancel_appointment(appointment_id):
     if "user_id" not in session or session["role"] != "patient":
         return redirect("/patient-login")
     
-    appointment = Appointment.query.get(appointment_id)
+    appointment = db.session.get(Appointment, appointment_id,
+                                 options=[selectinload(Appointment.availability)])
     if appointment and appointment.patient_id == session["user_id"]:
         appointment.status = "Cancelled"
         if appointment.availability:
@@ -427,7 +656,7 @@ def update_appointment(appointment_id):
     if "user_id" not in session or session["role"] != "doctor":
         return redirect("/doctor-login")
     
-    appointment = Appointment.query.get(appointment_id)
+    appointment = db.session.get(Appointment, appointment_id)
     if appointment and appointment.doctor_id == session["user_id"]:
         appointment.status = "Done"
         db.session.commit()
@@ -435,6 +664,7 @@ def update_appointment(appointment_id):
     return redirect("/doctor-dashboard")
 
 @app.route("/symptom-checker", methods=["GET", "POST"])
+@limiter.limit("20/hour", methods=["POST"])
 def symptom_checker():
     if "user_id" not in session or session["role"] != "patient":
         return redirect("/patient-login")
@@ -442,27 +672,19 @@ def symptom_checker():
     if request.method == "POST":
         try:
             symptoms = request.form.get("symptoms", "").split(",")
-            age = request.form.get("age", 30)
+            age = int(request.form.get("age") or 30)
             gender = request.form.get("gender", "prefer not to say")
 
-            headers = {
-                "X-RapidAPI-Key": os.getenv('RAPIDAPI_KEY'),
-                "X-RapidAPI-Host": "ai-medical-diagnosis-api-symptoms-to-results.p.rapidapi.com"
-            }
-            payload = {
-                "symptoms": [s.strip() for s in symptoms],
-                "patientInfo": {"age": age, "gender": gender}
-            }
-
-            response = requests.post(
-                "https://ai-medical-diagnosis-api-symptoms-to-results.p.rapidapi.com/analyzeSymptomsAndDiagnose?noqueue=1",
-                json=payload,
-                headers=headers
-            )
-            response.raise_for_status()
-            return render_template("symptom_results.html", 
-                                 result=response.json().get('result', {}),
-                                 result_time=datetime.now().timestamp())
+            key = symptom_cache_key(symptoms, age, gender)
+            cached = cache.get(key)
+            if cached is not None:
+                return render_template("symptom_results.html",
+                                     result=cached,
+                                     result_time=datetime.now().timestamp())
+
+            task = diagnose.delay([s.strip() for s in symptoms], age, gender)
+            session["symptom_task"] = {"id": task.id, "cache_key": key}
+            return redirect(url_for("symptom_result", task_id=task.id))
 
         except Exception as e:
             flash(f"Symptom check failed: {str(e)}", "danger")
@@ -470,6 +692,36 @@ def symptom_checker():
 
     return render_template("symptom_checker.html")
 
+@app.route("/symptom-checker/<task_id>")
+def symptom_result(task_id):
+    if "user_id" not in session or session["role"] != "patient":
+        return redirect("/patient-login")
+
+    pending = session.get("symptom_task") or {}
+    if pending.get("id") != task_id:
+        flash("Symptom check not found", "danger")
+        return redirect("/symptom-checker")
+
+    try:
+        task = diagnose.AsyncResult(task_id)
+        state = task.state
+        if state == "SUCCESS":
+            result = task.result.get('result', {})
+            cache.set(pending["cache_key"], result, timeout=SYMPTOM_CACHE_TTL)
+            return render_template("symptom_results.html",
+                                 result=result,
+                                 result_time=datetime.now().timestamp())
+        if state == "FAILURE":
+            flash(f"Symptom check failed: {str(task.result)}", "danger")
+            return redirect("/symptom-checker")
+
+    except Exception as e:
+        logger.error(f"Symptom result error: {str(e)}", exc_info=True)
+        flash(f"Symptom check failed: {str(e)}", "danger")
+        return redirect("/symptom-checker")
+
+    return render_template("symptom_pending.html")
+
 @app.route("/reminders", methods=["GET", "POST"])
 def reminders():
     if "user_id" not in session or session["role"] != "patient":
@@ -480,12 +732,13 @@ def reminders():
             new_reminder = Reminder(
                 user_id=session["user_id"],
                 medicine_name=request.form["medicine_name"],
-                reminder_time=datetime.fromisoformat(request.form["reminder_time"]),
+                reminder_time=datetime.fromisoformat(request.form["reminder_time"]).replace(tzinfo=timezone.utc),
                 notes=request.form.get("notes", ""),
                 frequency=request.form.get("frequency", "once")
             )
             db.session.add(new_reminder)
             db.session.commit()
+            schedule_reminder(new_reminder)
             flash("Reminder added successfully", "success")
         except Exception as e:
             db.session.rollback()
@@ -500,49 +753,80 @@ def delete_reminder(reminder_id):
     if "user_id" not in session:
         return redirect("/login")
     
-    reminder = Reminder.query.get(reminder_id)
+    reminder = db.session.get(Reminder, reminder_id)
     if reminder and reminder.user_id == session["user_id"]:
         db.session.delete(reminder)
         db.session.commit()
+        unschedule_reminder(reminder_id)
         flash("Reminder deleted", "success")
     return redirect("/reminders")
 
+def fire_reminder(reminder_id):
+    with app.app_context():
+        try:
+            reminder = db.session.get(Reminder, reminder_id,
+                                      options=[selectinload(Reminder.user)])
+            if not reminder or reminder.alerted:
+                unschedule_reminder(reminder_id)
+                return
+
+            notification = (reminder.user.email, reminder.medicine_name)
+            advance_reminder(reminder, datetime.now(timezone.utc))
+            db.session.commit()
+            send_reminder_notification.delay(*notification)
+
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Reminder error: {str(e)}", exc_info=True)
+
 def check_reminders():
-    while True:
-        with app.app_context():
-            try:
-                now = datetime.now(timezone.utc)
-                reminders = Reminder.query.filter(
-                    Reminder.alerted == False,
-                    Reminder.reminder_time <= now
-                ).all()
-
-                for reminder in reminders:
-                    print(f"Reminder: {reminder.medicine_name}")
-                    if reminder.frequency != 'once':
-                        new_time = reminder.reminder_time
-                        if reminder.frequency == 'daily':
-                            new_time += timedelta(days=1)
-                        elif reminder.frequency == 'weekly':
-                            new_time += timedelta(weeks=1)
-                        reminder.reminder_time = new_time
-                    else:
-                        reminder.alerted = True
-                    
-                    db.session.commit()
-
-            except Exception as e:
-                print(f"Reminder error: {str(e)}")
-        
-        time.sleep(60)
+    """Handle reminders that have no scheduler job (rows created before the scheduler
+    existed): catch up on any that are already due, then schedule them. Reminders that
+    do have a job are left to APScheduler's misfire/coalesce handling, so each
+    occurrence is delivered once. Must run while the scheduler is started (paused is
+    fine) so get_job sees the job store."""
+    with app.app_context():
+        try:
+            now = datetime.now(timezone.utc)
+            unscheduled = [
+                reminder for reminder in
+                Reminder.query.options(selectinload(Reminder.user)).filter_by(alerted=False).all()
+                if scheduler.get_job(reminder_job_id(reminder.id)) is None
+            ]
+
+            once_ids = []
+            notifications = []
+            for reminder in unscheduled:
+                if as_utc(reminder.reminder_time) > now:
+                    continue
+                notifications.append((reminder.user.email, reminder.medicine_name))
+                if reminder.frequency in ('daily', 'weekly'):
+                    advance_reminder(reminder, now)
+                else:
+                    once_ids.append(reminder.id)
+
+            if once_ids:
+                Reminder.query.filter(Reminder.id.in_(once_ids))\
+                    .update({'alerted': True}, synchronize_session=False)
+            db.session.commit()
+
+            # Only notify once the batch is committed, so a rollback doesn't resend
+            for notification in notifications:
+                send_reminder_notification.delay(*notification)
+
+            for reminder in unscheduled:
+                if reminder.id not in once_ids:
+                    schedule_reminder(reminder)
+
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Reminder error: {str(e)}", exc_info=True)
 
 @app.route("/logout")
 def logout():
-    if "user_id" in session:
-        user = User.query.get(session["user_id"])
-        if user.role == "doctor":
-            user.status = "Offline"
-            db.session.commit()
+    if g.user and g.user.role == "doctor":
+        g.user.status = "Offline"
+        db.session.commit()
     
     session.clear()
     flash("Logged out successfully", "success")
@@ -554,12 +838,29 @@ def init_db():
     with app.app_context():
         db.drop_all()
         db.create_all()
+        # create_all builds the current schema; record that so `flask db upgrade` starts from here
+        stamp()
         logger.info("Database initialized")
     print("Database setup completed")
 
+@app.cli.command("run-scheduler")
+def run_scheduler():
+    """Run reminder jobs; start exactly one of these per deployment"""
+    check_reminders()
+    # APScheduler can't see jobs other processes add to the store until it wakes up,
+    # so keep a no-op job that bounds the sleep
+    scheduler.add_job(lambda: None, 'interval', seconds=SCHEDULER_POLL_INTERVAL,
+                      id='wakeup', jobstore='local', replace_existing=True)
+    scheduler.resume()
+    logger.info("Reminder scheduler running")
+    try:
+        while True:
+            time.sleep(3600)
+    except (KeyboardInterrupt, SystemExit):
+        scheduler.shutdown()
+
 if __name__ == '__main__':
     with app.app_context():
         db.create_all()
-    reminder_thread = threading.Thread(target=check_reminders, daemon=True)
-    reminder_thread.start()
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    warm_template_cache()
+    app.run(host='0.0.0.0', port=5000, debug=DEBUG)
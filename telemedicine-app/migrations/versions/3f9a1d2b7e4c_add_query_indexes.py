@@ -0,0 +1,42 @@
+"""add composite indexes for dashboard and reminder queries
+
+Revision ID: 3f9a1d2b7e4c
+Revises: c7bc8cbac7f1
+Create Date: 2026-10-14 09:12:41.503218
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f9a1d2b7e4c'
+down_revision = 'c7bc8cbac7f1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('appointment', schema=None) as batch_op:
+        batch_op.create_index('ix_appt_doctor_time', ['doctor_id', 'appointment_time'], unique=False)
+        batch_op.create_index('ix_appt_patient_time', ['patient_id', 'appointment_time'], unique=False)
+
+    with op.batch_alter_table('doctor_availability', schema=None) as batch_op:
+        batch_op.create_index('ix_avail_doctor_status_start', ['doctor_id', 'status', 'start_time'], unique=False)
+
+    with op.batch_alter_table('reminder', schema=None) as batch_op:
+        batch_op.create_index('ix_rem_alerted_time', ['alerted', 'reminder_time'], unique=False)
+        batch_op.create_index('ix_rem_user_time', ['user_id', 'reminder_time'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('reminder', schema=None) as batch_op:
+        batch_op.drop_index('ix_rem_user_time')
+        batch_op.drop_index('ix_rem_alerted_time')
+
+    with op.batch_alter_table('doctor_availability', schema=None) as batch_op:
+        batch_op.drop_index('ix_avail_doctor_status_start')
+
+    with op.batch_alter_table('appointment', schema=None) as batch_op:
+        batch_op.drop_index('ix_appt_patient_time')
+        batch_op.drop_index('ix_appt_doctor_time')
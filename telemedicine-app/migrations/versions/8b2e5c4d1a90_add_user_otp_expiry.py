@@ -0,0 +1,26 @@
+"""add user.otp_expires_at
+
+Revision ID: 8b2e5c4d1a90
+Revises: 3f9a1d2b7e4c
+Create Date: 2026-10-14 11:47:05.118342
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b2e5c4d1a90'
+down_revision = '3f9a1d2b7e4c'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('otp_expires_at', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_column('otp_expires_at')
@@ -0,0 +1,81 @@
+import os
+import logging
+import smtplib
+import requests
+from email.message import EmailMessage
+from celery import Celery
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+
+load_dotenv()
+
+logger = logging.getLogger('telemedicine-app.tasks')
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+celery = Celery(
+    'telemedicine-app',
+    broker=os.getenv("CELERY_BROKER_URL", REDIS_URL),
+    backend=os.getenv("CELERY_RESULT_BACKEND", REDIS_URL)
+)
+
+DIAGNOSIS_HOST = "ai-medical-diagnosis-api-symptoms-to-results.p.rapidapi.com"
+DIAGNOSIS_URL = f"https://{DIAGNOSIS_HOST}/analyzeSymptomsAndDiagnose?noqueue=1"
+
+# Keep TCP/TLS connections to RapidAPI alive between tasks
+_session = requests.Session()
+_session.mount("https://", HTTPAdapter(pool_connections=10, pool_maxsize=20))
+
+@celery.task
+def diagnose(symptoms, age, gender):
+    headers = {
+        "X-RapidAPI-Key": os.getenv('RAPIDAPI_KEY'),
+        "X-RapidAPI-Host": DIAGNOSIS_HOST
+    }
+    payload = {
+        "symptoms": symptoms,
+        "patientInfo": {"age": age, "gender": gender}
+    }
+
+    response = _session.post(DIAGNOSIS_URL, json=payload, headers=headers, timeout=30)
+    response.raise_for_status()
+    return response.json()
+
+# Local development only: write outgoing mail to the worker log instead of sending it
+MAIL_CONSOLE = os.getenv("MAIL_CONSOLE", "False").lower() in ("1", "true")
+
+def _send_email(to, subject, body):
+    smtp_host = os.getenv("SMTP_HOST")
+    if not smtp_host:
+        if MAIL_CONSOLE:
+            logger.warning(f"MAIL_CONSOLE set, not sending mail to {to}: {subject}\n{body}")
+            return
+        raise RuntimeError("SMTP_HOST is not configured")
+
+    message = EmailMessage()
+    message["Subject"] = subject
+    message["From"] = os.getenv("SMTP_FROM", "no-reply@teledoctor.local")
+    message["To"] = to
+    message.set_content(body)
+
+    with smtplib.SMTP(smtp_host, int(os.getenv("SMTP_PORT", 587)), timeout=10) as smtp:
+        smtp.starttls()
+        if os.getenv("SMTP_USER"):
+            smtp.login(os.getenv("SMTP_USER"), os.getenv("SMTP_PASSWORD"))
+        smtp.send_message(message)
+
+@celery.task(bind=True, max_retries=3)
+def send_otp(self, email, otp):
+    try:
+        _send_email(email, "Your Teledoctor login code",
+                    f"Your one-time login code is {otp}. It expires in 5 minutes.")
+    except (smtplib.SMTPException, OSError) as e:
+        raise self.retry(exc=e, countdown=10)
+
+@celery.task(bind=True, max_retries=3)
+def send_reminder_notification(self, email, medicine_name):
+    try:
+        _send_email(email, f"Medication reminder: {medicine_name}",
+                    f"It's time to take {medicine_name}.")
+    except (smtplib.SMTPException, OSError) as e:
+        raise self.retry(exc=e, countdown=60)